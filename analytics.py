@@ -1,24 +1,49 @@
 import pandas as pd
 import numpy as np
-from statsmodels.api import OLS, add_constant
+from numba import njit
 from statsmodels.tsa.stattools import adfuller
 
 def prepare_dataframe(df):
-    df["time"] = pd.to_datetime(df["time"])
+    df["time"] = pd.to_datetime(df["time"], format="ISO8601", utc=True, cache=True)
     df.set_index("time", inplace=True)
     return df
 
+_RULE_MAP = {"1s": "1s", "1m": "1min", "5m": "5min"}
+
 def resample(df, timeframe):
-    rule = {"1s": "1S", "1m": "1T", "5m": "5T"}[timeframe]
-    return df.resample(rule).agg({
-        "price": "last",
-        "qty": "sum"
+    r = df.resample(_RULE_MAP[timeframe])
+    return pd.DataFrame({
+        "price": r["price"].last(),
+        "qty": r["qty"].sum()
     }).dropna()
 
+@njit(cache=True, fastmath=True)
+def _hedge_ratio_kernel(x, y):
+    # Single pass over both arrays; values are shifted by the first sample
+    # so the raw sums stay small and the slope doesn't lose precision
+    n = x.shape[0]
+    x0 = x[0]
+    y0 = y[0]
+    sx = 0.0
+    sy = 0.0
+    sxx = 0.0
+    sxy = 0.0
+    for i in range(n):
+        dx = x[i] - x0
+        dy = y[i] - y0
+        sx += dx
+        sy += dy
+        sxx += dx * dx
+        sxy += dx * dy
+    denom = n * sxx - sx * sx
+    if denom == 0.0:
+        return np.nan
+    return (n * sxy - sx * sy) / denom
+
 def hedge_ratio(y, x):
     # Convert inputs to numpy arrays to avoid pandas Index alignment issues
-    y_arr = np.asarray(y).astype(float)
-    x_arr = np.asarray(x).astype(float)
+    y_arr = np.asarray(y, dtype=np.float64)
+    x_arr = np.asarray(x, dtype=np.float64)
 
     # Ensure 1-D
     if y_arr.ndim != 1:
@@ -33,19 +58,301 @@ def hedge_ratio(y, x):
     y_arr = y_arr[-min_len:]
     x_arr = x_arr[-min_len:]
 
-    x_with_const = add_constant(x_arr)
-    model = OLS(y_arr, x_with_const).fit()
-    return model.params[1]
+    # Single-regressor OLS slope in closed form: cov(x, y) / var(x)
+    return _hedge_ratio_kernel(
+        np.ascontiguousarray(x_arr), np.ascontiguousarray(y_arr)
+    )
+
+def spread(p1, p2, hedge, out=None, dtype=np.float64):
+    # Written into a single output buffer; pass dtype=np.float32 on long
+    # display-only series to halve the memory traffic
+    a = np.asarray(p1, dtype=dtype)
+    b = np.asarray(p2, dtype=dtype)
+    if out is None:
+        out = np.empty_like(a)
+    np.multiply(b, hedge, out=out)
+    np.subtract(a, out, out=out)
+    return out
 
-def spread(series1, series2, hedge):
-    return series1 - hedge * series2
+@njit(cache=True, fastmath=True)
+def _zscore_kernel(a):
+    # Welford's online mean/variance, then one normalizing pass
+    n = a.shape[0]
+    out = np.full(n, np.nan)
+    if n < 2:
+        return out
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        delta = a[i] - mean
+        mean += delta / (i + 1)
+        m2 += delta * (a[i] - mean)
+    std = np.sqrt(m2 / (n - 1))
+    if std == 0.0:
+        return out
+    for i in range(n):
+        out[i] = (a[i] - mean) / std
+    return out
 
 def zscore(series):
-    return (series - series.mean()) / series.std()
+    vals = np.ascontiguousarray(series, dtype=np.float64)
+    return pd.Series(_zscore_kernel(vals), index=series.index)
+
+@njit(cache=True, fastmath=True)
+def _spread_zscore_kernel(p1, p2, hedge):
+    # Spread and Welford moments in the same pass, then normalize
+    n = p1.shape[0]
+    spr_out = np.empty(n)
+    zs_out = np.full(n, np.nan)
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        t = p1[i] - hedge * p2[i]
+        spr_out[i] = t
+        delta = t - mean
+        mean += delta / (i + 1)
+        m2 += delta * (t - mean)
+    if n < 2:
+        return spr_out, zs_out
+    std = np.sqrt(m2 / (n - 1))
+    if std == 0.0:
+        return spr_out, zs_out
+    for i in range(n):
+        zs_out[i] = (spr_out[i] - mean) / std
+    return spr_out, zs_out
+
+def spread_zscore(p1, p2, hedge):
+    a = np.ascontiguousarray(p1, dtype=np.float64)
+    b = np.ascontiguousarray(p2, dtype=np.float64)
+    return _spread_zscore_kernel(a, b, float(hedge))
+
+@njit(cache=True, fastmath=True)
+def _rolling_corr_kernel(x, y, d):
+    # Running sums over the window: add the incoming sample, drop the one
+    # leaving it. Values are shifted by the first sample as in the hedge
+    # ratio kernel to keep the sums small.
+    n = x.shape[0]
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+    x0 = x[0]
+    y0 = y[0]
+    s1 = 0.0
+    s2 = 0.0
+    s11 = 0.0
+    s22 = 0.0
+    s12 = 0.0
+    for i in range(n):
+        a = x[i] - x0
+        b = y[i] - y0
+        s1 += a
+        s2 += b
+        s11 += a * a
+        s22 += b * b
+        s12 += a * b
+        if i >= d:
+            a = x[i - d] - x0
+            b = y[i - d] - y0
+            s1 -= a
+            s2 -= b
+            s11 -= a * a
+            s22 -= b * b
+            s12 -= a * b
+        if i >= d - 1:
+            denom = (d * s11 - s1 * s1) * (d * s22 - s2 * s2)
+            if denom > 0.0:
+                out[i] = (d * s12 - s1 * s2) / np.sqrt(denom)
+    return out
 
 def rolling_corr(s1, s2, window):
-    return s1.rolling(window).corr(s2)
+    x1 = np.ascontiguousarray(s1, dtype=np.float64)
+    x2 = np.ascontiguousarray(s2, dtype=np.float64)
+    return pd.Series(
+        _rolling_corr_kernel(x1, x2, int(window)), index=getattr(s1, "index", None)
+    )
+
+# ---- Incremental pair state ----
+# Sums are stored as [p1_0, p2_0, n, s1, s2, s11, s22, s12] with values
+# shifted by the anchors (p1_0, p2_0), so a state can be advanced by the new
+# bars only instead of recomputing over the whole lookback.
+
+@njit(cache=True, fastmath=True)
+def _sums_update(sums, p1, p2, sign):
+    for i in range(p1.shape[0]):
+        a = p1[i] - sums[0]
+        b = p2[i] - sums[1]
+        sums[2] += sign
+        sums[3] += sign * a
+        sums[4] += sign * b
+        sums[5] += sign * a * a
+        sums[6] += sign * b * b
+        sums[7] += sign * a * b
+
+@njit(cache=True, fastmath=True)
+def _rolling_corr_update(sums, new_x, new_y, d, hist_x, hist_y):
+    # Advance rolling-window sums over new samples. hist holds the samples
+    # preceding new_x (at most the last d), used for the outgoing values.
+    m = new_x.shape[0]
+    h = hist_x.shape[0]
+    out = np.full(m, np.nan)
+    for j in range(m):
+        a = new_x[j] - sums[0]
+        b = new_y[j] - sums[1]
+        sums[3] += a
+        sums[4] += b
+        sums[5] += a * a
+        sums[6] += b * b
+        sums[7] += a * b
+        k = h + j - d
+        if k >= 0:
+            if k < h:
+                a = hist_x[k] - sums[0]
+                b = hist_y[k] - sums[1]
+            else:
+                a = new_x[k - h] - sums[0]
+                b = new_y[k - h] - sums[1]
+            sums[3] -= a
+            sums[4] -= b
+            sums[5] -= a * a
+            sums[6] -= b * b
+            sums[7] -= a * b
+        if h + j >= d - 1:
+            denom = (d * sums[5] - sums[3] * sums[3]) * (d * sums[6] - sums[4] * sums[4])
+            if denom > 0.0:
+                out[j] = (d * sums[7] - sums[3] * sums[4]) / np.sqrt(denom)
+    return out
+
+def _new_sums(p1, p2):
+    sums = np.zeros(8)
+    if len(p1):
+        sums[0] = p1[0]
+        sums[1] = p2[0]
+    return sums
+
+def init_pair_state(p1, p2, window):
+    p1 = np.ascontiguousarray(p1, dtype=np.float64)
+    p2 = np.ascontiguousarray(p2, dtype=np.float64)
+    window = int(window)
+    empty = np.empty(0)
+    roll = _new_sums(p1, p2)
+    corr = _rolling_corr_update(roll, p1, p2, window, empty, empty)
+    mom = _new_sums(p1, p2)
+    _sums_update(mom, p1, p2, 1.0)
+    return {"p1": p1, "p2": p2, "corr": corr, "window": window, "roll": roll, "mom": mom}
+
+def extend_pair_state(state, new_p1, new_p2, n_drop=0):
+    # Append new bars and drop the n_drop oldest ones that fell out of the
+    # lookback; only the new and dropped bars are touched arithmetically.
+    new_p1 = np.ascontiguousarray(new_p1, dtype=np.float64)
+    new_p2 = np.ascontiguousarray(new_p2, dtype=np.float64)
+    d = state["window"]
+    old_p1, old_p2 = state["p1"], state["p2"]
+    new_corr = _rolling_corr_update(
+        state["roll"], new_p1, new_p2, d, old_p1[-d:], old_p2[-d:]
+    )
+    if n_drop:
+        _sums_update(state["mom"], old_p1[:n_drop], old_p2[:n_drop], -1.0)
+    _sums_update(state["mom"], new_p1, new_p2, 1.0)
+    state["p1"] = np.concatenate((old_p1[n_drop:], new_p1))
+    state["p2"] = np.concatenate((old_p2[n_drop:], new_p2))
+    corr = np.concatenate((state["corr"][n_drop:], new_corr))
+    if n_drop:
+        # Leading windows now reach back past the start of the lookback
+        corr[:d - 1] = np.nan
+    state["corr"] = corr
+    return state
+
+def pair_snapshot(state, tail_p1=(), tail_p2=()):
+    # Hedge ratio, spread, z-score and rolling correlation for the state
+    # plus uncommitted tail bars (e.g. the bar still forming). The tail is
+    # folded into copies of the sums, so the state itself is unchanged.
+    tail_p1 = np.ascontiguousarray(tail_p1, dtype=np.float64)
+    tail_p2 = np.ascontiguousarray(tail_p2, dtype=np.float64)
+    d = state["window"]
+    roll = state["roll"].copy()
+    tail_corr = _rolling_corr_update(
+        roll, tail_p1, tail_p2, d, state["p1"][-d:], state["p2"][-d:]
+    )
+    mom = state["mom"].copy()
+    _sums_update(mom, tail_p1, tail_p2, 1.0)
+    p1 = np.concatenate((state["p1"], tail_p1))
+    p2 = np.concatenate((state["p2"], tail_p2))
+    corr = np.concatenate((state["corr"], tail_corr))
+
+    n, s1, s2, s11, s22, s12 = mom[2:]
+    c11 = s11 - s1 * s1 / n
+    c22 = s22 - s2 * s2 / n
+    c12 = s12 - s1 * s2 / n
+    hedge = c12 / c22 if c22 > 0 else np.nan
+    spr = p1 - hedge * p2
+    # Spread moments follow from the pair moments for any hedge ratio
+    spr_mean = (mom[0] + s1 / n) - hedge * (mom[1] + s2 / n)
+    spr_var = (c11 + hedge * hedge * c22 - 2 * hedge * c12) / (n - 1) if n > 1 else 0.0
+    if spr_var > 0:
+        zs = (spr - spr_mean) / np.sqrt(spr_var)
+    else:
+        zs = np.full(len(spr), np.nan)
+    return hedge, spr, zs, corr
+
+# ---- Plot downsampling ----
+
+@njit(cache=True)
+def _lttb_kernel(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the first and last points and,
+    # per bucket, the point forming the largest triangle with the previous
+    # pick and the next bucket's average
+    n = x.shape[0]
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[n_out - 1] = n - 1
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    for i in range(n_out - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = 0.0
+        avg_y = 0.0
+        for j in range(avg_start, avg_end):
+            avg_x += x[j]
+            avg_y += y[j]
+        cnt = max(avg_end - avg_start, 1)
+        avg_x /= cnt
+        avg_y /= cnt
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        max_area = -1.0
+        chosen = range_start
+        for j in range(range_start, range_end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > max_area:
+                max_area = area
+                chosen = j
+        idx[i + 1] = chosen
+        a = chosen
+    return idx
+
+def lttb_indices(x, y, n_out):
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    if n_out < 3 or len(x) <= n_out:
+        return np.arange(len(x))
+    return _lttb_kernel(x, y, int(n_out))
 
 def adf_test(series):
-    stat, pval, *_ = adfuller(series.dropna())
+    # Upstream data is already NaN-free in the common case, so only copy
+    # when there is something to drop
+    arr = np.asarray(series, dtype=np.float64)
+    nan_mask = np.isnan(arr)
+    if nan_mask.any():
+        arr = arr[~nan_mask]
+    stat, pval, *_ = adfuller(arr)
     return stat, pval
+
+# Compile at import so the first dashboard refresh doesn't pay for it
+_warmup = np.arange(3, dtype=np.float64)
+_hedge_ratio_kernel(_warmup, _warmup)
+_rolling_corr_kernel(_warmup, _warmup, 2)
+_zscore_kernel(_warmup)
+_spread_zscore_kernel(_warmup, _warmup, 1.0)
+init_pair_state(_warmup, _warmup, 2)
+_lttb_kernel(_warmup, _warmup, 3)
@@ -1,14 +1,25 @@
 import streamlit as st
+from streamlit_autorefresh import st_autorefresh
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import time
 import io
+from collections import deque
 from datetime import datetime
 
 from ingestion import start_stream
 from services import load_pair_bars, health, SYMBOLS, TIMEFRAMES
-from analytics import hedge_ratio, spread, zscore, rolling_corr, adf_test
+from analytics import (
+    hedge_ratio,
+    spread_zscore,
+    rolling_corr,
+    adf_test,
+    init_pair_state,
+    extend_pair_state,
+    pair_snapshot,
+    lttb_indices,
+)
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -18,6 +29,78 @@ st.set_page_config(
 
 st.title("📊 Real-Time Quant Analytics Dashboard")
 
+# ---------------- CACHED ANALYTICS ----------------
+# Keyed on the price arrays, so reruns from widget interactions reuse the
+# previous results and only new bars trigger a recompute.
+@st.cache_data(ttl=60, max_entries=8)
+def cached_hedge_ratio(p1, p2):
+    return hedge_ratio(p1, p2)
+
+@st.cache_data(ttl=60, max_entries=8)
+def cached_rolling_corr(p1, p2, window):
+    return rolling_corr(p1, p2, window).to_numpy()
+
+@st.cache_data(ttl=60, max_entries=8)
+def cached_adf_test(spr_arr):
+    return adf_test(spr_arr)
+
+def build_csv_export(export_df):
+    return export_df.to_csv(index=False).encode('utf-8')
+
+def build_json_export(export_df):
+    return export_df.to_json(orient='records', indent=2).encode('utf-8')
+
+def build_excel_export(export_df):
+    excel_buffer = io.BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+        export_df.to_excel(writer, index=False, sheet_name='Analytics')
+    return excel_buffer.getvalue()
+
+# Plotly ships every point to the browser on each rerun; long series are
+# reduced with LTTB, which keeps the visual shape of the line.
+def downsample(series, n_out=2000):
+    if len(series) <= 2 * n_out:
+        return series.index, series
+    idx = lttb_indices(series.index, series.to_numpy(dtype=float), n_out)
+    return series.index[idx], series.iloc[idx]
+
+# Figures are built once and kept in session state; reruns only swap the
+# trace data and the "current value" annotations. A figure is rebuilt when
+# its signature (the inputs its static decorations depend on) changes.
+def cached_figure(name, signature, build):
+    figs = st.session_state.setdefault("figs", {})
+    entry = figs.get(name)
+    if entry is None or entry[0] != signature:
+        entry = (signature, build())
+        figs[name] = entry
+    return entry[1]
+
+# Live mode keeps running sums in session state and only advances them by
+# the bars that arrived since the previous refresh. The newest bar is still
+# forming, so it is never committed to the state.
+def incremental_pair_analytics(key, bar_times, p1, p2, window):
+    state = st.session_state.get("rolling_state")
+    n_closed = len(p1) - 1
+    if state is not None and state["key"] == key:
+        pos = bar_times.searchsorted(state["last_ts"], side="right")
+        n_drop = len(state["p1"]) - pos
+        if (
+            0 < pos <= n_closed
+            and n_drop >= 0
+            and bar_times[pos - 1] == state["last_ts"]
+            and p1[pos - 1] == state["p1"][-1]
+            and p2[pos - 1] == state["p2"][-1]
+        ):
+            extend_pair_state(state, p1[pos:n_closed], p2[pos:n_closed], n_drop)
+        else:
+            state = None
+    if state is None:
+        state = init_pair_state(p1[:n_closed], p2[:n_closed], window)
+        state["key"] = key
+    state["last_ts"] = bar_times[n_closed - 1]
+    st.session_state.rolling_state = state
+    return pair_snapshot(state, p1[n_closed:], p2[n_closed:])
+
 # Store previous values for delta calculation
 if 'prev_price1' not in st.session_state:
     st.session_state.prev_price1 = None
@@ -28,6 +111,10 @@ if 'prev_zscore' not in st.session_state:
 if 'prev_corr' not in st.session_state:
     st.session_state.prev_corr = None
 
+# Export file bytes, built when the user asks for them
+if 'exports' not in st.session_state:
+    st.session_state.exports = None
+
 # ---------------- SIDEBAR CONTROLS ----------------
 st.sidebar.header("Controls")
 
@@ -89,7 +176,7 @@ if 'last_refresh_time' not in st.session_state:
 
 # Initialize session state for alert log
 if 'alert_log' not in st.session_state:
-    st.session_state.alert_log = []
+    st.session_state.alert_log = deque(maxlen=100)  # Bounded: only the latest alerts are shown
 if 'last_alert_state' not in st.session_state:
     st.session_state.last_alert_state = False  # Track if we were in alert state last time
 
@@ -108,6 +195,11 @@ if data_mode == "Live Binance Data":
             )
             st.session_state.refresh_interval = refresh_interval
 
+    # Reruns are scheduled by a browser-side timer, so the server thread is
+    # never parked in a sleep between refreshes
+    if st.session_state.auto_refresh_enabled:
+        st_autorefresh(interval=st.session_state.refresh_interval * 1000, key="live_refresh")
+
 # ---------------- DATA LOADING ----------------
 if data_mode == "Live Binance Data":
 
@@ -115,8 +207,8 @@ if data_mode == "Live Binance Data":
         start_stream(symbol_1)
         start_stream(symbol_2)
         st.sidebar.success("Live feed started")
+        time.sleep(1)  # Give the first ticks a moment to arrive
 
-    time.sleep(1)
     df1_r, df2_r = load_pair_bars(symbol_1, symbol_2, timeframe, lookback_hours)
     
     # Update last refresh time
@@ -174,8 +266,17 @@ else:
         st.info("Please upload an OHLC CSV file.")
         st.stop()
 
-    ohlc = pd.read_csv(uploaded_file)
-    ohlc["timestamp"] = pd.to_datetime(ohlc["timestamp"])
+    try:
+        # Arrow's multithreaded CSV reader (requires pyarrow)
+        ohlc = pd.read_csv(uploaded_file, engine="pyarrow")
+    except ImportError:
+        uploaded_file.seek(0)
+        ohlc = pd.read_csv(uploaded_file)
+    try:
+        ohlc["timestamp"] = pd.to_datetime(ohlc["timestamp"], format="ISO8601", utc=True, cache=True)
+    except ValueError:
+        # Not ISO-8601; fall back to per-row format inference
+        ohlc["timestamp"] = pd.to_datetime(ohlc["timestamp"], utc=True, cache=True)
     ohlc.set_index("timestamp", inplace=True)
 
     # Normalize: ensure 'price' column exists
@@ -184,11 +285,14 @@ else:
     elif 'price' not in ohlc.columns:
         st.error("Uploaded CSV must contain 'close' or 'price' column")
         st.stop()
-    df1_r = ohlc.copy()
-    df2_r = df1_r.copy()  # For single-instrument analytics
+    # Both legs share the same frame for single-instrument analytics; nothing
+    # downstream writes to them, so no copies are needed
+    df1_r = ohlc
+    df2_r = ohlc
 
 # ---------------- ALIGN DATA ----------------
 min_len = min(len(df1_r), len(df2_r))
+bar_times = df1_r.index[-min_len:]
 df1_r = df1_r.iloc[-min_len:].reset_index(drop=True)
 df2_r = df2_r.iloc[-min_len:].reset_index(drop=True)
 
@@ -202,16 +306,31 @@ if 'price' not in df1_r.columns or 'price' not in df2_r.columns:
     st.stop()
 
 # ---------------- ANALYTICS ----------------
-hedge = hedge_ratio(df1_r['price'], df2_r['price'])
-spr = spread(df1_r['price'], df2_r['price'], hedge)
-zs = zscore(spr)
-corr = rolling_corr(df1_r['price'], df2_r['price'], rolling_window)
+price1_arr = df1_r['price'].to_numpy(dtype=float)
+price2_arr = df2_r['price'].to_numpy(dtype=float)
+if data_mode == "Live Binance Data":
+    hedge, spr_arr, zs_arr, corr_arr = incremental_pair_analytics(
+        (symbol_1, symbol_2, timeframe, lookback_hours, rolling_window),
+        bar_times,
+        price1_arr,
+        price2_arr,
+        rolling_window,
+    )
+else:
+    hedge = cached_hedge_ratio(price1_arr, price2_arr)
+    spr_arr, zs_arr = spread_zscore(price1_arr, price2_arr, hedge)
+    corr_arr = cached_rolling_corr(price1_arr, price2_arr, rolling_window)
+spr = pd.Series(spr_arr, index=df1_r.index)
+zs = pd.Series(zs_arr, index=df1_r.index)
+corr = pd.Series(corr_arr, index=df1_r.index)
 
 # Calculate deltas for metrics
-current_price1 = df1_r['price'].iloc[-1]
-current_price2 = df2_r['price'].iloc[-1]
-current_z = zs.iloc[-1]
-current_corr = corr.iloc[-1]
+# Latest values are read once from the raw arrays and reused by every tab
+current_price1 = price1_arr[-1]
+current_price2 = price2_arr[-1]
+current_z = zs_arr[-1]
+current_corr = corr_arr[-1]
+current_spread = spr_arr[-1]
 
 delta_price1 = current_price1 - st.session_state.prev_price1 if st.session_state.prev_price1 is not None else None
 delta_price2 = current_price2 - st.session_state.prev_price2 if st.session_state.prev_price2 is not None else None
@@ -224,6 +343,13 @@ st.session_state.prev_price2 = current_price2
 st.session_state.prev_zscore = current_z
 st.session_state.prev_corr = current_corr
 
+# Downsampled copies for the charts; metrics and annotations use the full series
+px1_x, px1_y = downsample(df1_r['price'])
+px2_x, px2_y = downsample(df2_r['price'])
+spr_x, spr_y = downsample(spr)
+zs_x, zs_y = downsample(zs)
+corr_x, corr_y = downsample(corr)
+
 # ---------------- HEADER INFO BAR ----------------
 info_container = st.container()
 with info_container:
@@ -246,67 +372,77 @@ tab_prices, tab_analytics, tab_alerts, tab_upload = st.tabs(
 
 # ================= TAB: PRICES =================
 with tab_prices:
-    # Create figure with dual y-axes
-    fig_price = go.Figure()
-    
-    # Add trace for symbol 1 (left y-axis)
-    fig_price.add_trace(go.Scatter(
-        x=df1_r.index,
-        y=df1_r['price'],
-        name=f"{symbol_1.upper()}",
-        line=dict(color='#1f77b4', width=2),
-        hovertemplate='<b>%{fullData.name}</b><br>' +
-                      'Index: %{x}<br>' +
-                      'Price: $%{y:.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Add trace for symbol 2 (right y-axis)
-    fig_price.add_trace(go.Scatter(
-        x=df2_r.index,
-        y=df2_r['price'],
-        name=f"{symbol_2.upper()}",
-        line=dict(color='#ff7f0e', width=2),
-        yaxis='y2',
-        hovertemplate='<b>%{fullData.name}</b><br>' +
-                      'Index: %{x}<br>' +
-                      'Price: $%{y:.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Add vertical line at latest timestamp
-    max_idx = max(df1_r.index.max(), df2_r.index.max()) if len(df1_r) > 0 and len(df2_r) > 0 else 0
-    fig_price.add_vline(
-        x=max_idx,
-        line_dash="dot",
-        line_color="gray",
-        opacity=0.5,
-        annotation_text="Latest"
-    )
+    def build_price_figure():
+        # Create figure with dual y-axes
+        fig_price = go.Figure()
+    
+        # Add trace for symbol 1 (left y-axis)
+        fig_price.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name=f"{symbol_1.upper()}",
+            line=dict(color='#1f77b4', width=2),
+            hovertemplate='<b>%{fullData.name}</b><br>' +
+                          'Index: %{x}<br>' +
+                          'Price: $%{y:.2f}<br>' +
+                          '<extra></extra>'
+        ))
+    
+        # Add trace for symbol 2 (right y-axis)
+        fig_price.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name=f"{symbol_2.upper()}",
+            line=dict(color='#ff7f0e', width=2),
+            yaxis='y2',
+            hovertemplate='<b>%{fullData.name}</b><br>' +
+                          'Index: %{x}<br>' +
+                          'Price: $%{y:.2f}<br>' +
+                          '<extra></extra>'
+        ))
+    
+        # Add vertical line at latest timestamp (positioned on each rerun)
+        fig_price.add_vline(
+            x=0,
+            line_dash="dot",
+            line_color="gray",
+            opacity=0.5,
+            annotation_text="Latest"
+        )
     
-    # Update layout with dual y-axes
-    fig_price.update_layout(
-        title=f"Price Comparison: {symbol_1.upper()} vs {symbol_2.upper()}",
-        xaxis_title="Index",
-        yaxis=dict(
-            title=dict(text=f"{symbol_1.upper()} Price", font=dict(color='#1f77b4')),
-            tickfont=dict(color='#1f77b4')
-        ),
-        yaxis2=dict(
-            title=dict(text=f"{symbol_2.upper()} Price", font=dict(color='#ff7f0e')),
-            tickfont=dict(color='#ff7f0e'),
-            anchor="x",
-            overlaying="y",
-            side="right"
-        ),
-        hovermode="x unified",
-        template="plotly_white",
-        height=500,
-        showlegend=True,
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
+        # Update layout with dual y-axes
+        fig_price.update_layout(
+            title=f"Price Comparison: {symbol_1.upper()} vs {symbol_2.upper()}",
+            xaxis_title="Index",
+            yaxis=dict(
+                title=dict(text=f"{symbol_1.upper()} Price", font=dict(color='#1f77b4')),
+                tickfont=dict(color='#1f77b4')
+            ),
+            yaxis2=dict(
+                title=dict(text=f"{symbol_2.upper()} Price", font=dict(color='#ff7f0e')),
+                tickfont=dict(color='#ff7f0e'),
+                anchor="x",
+                overlaying="y",
+                side="right"
+            ),
+            hovermode="x unified",
+            template="plotly_white",
+            height=500,
+            showlegend=True,
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        return fig_price
+
+    fig_price = cached_figure("price", (symbol_1, symbol_2), build_price_figure)
+    fig_price.data[0].update(x=px1_x, y=px1_y)
+    fig_price.data[1].update(x=px2_x, y=px2_y)
+    
+    # Move the vertical "Latest" marker to the newest index
+    max_idx = max(df1_r.index.max(), df2_r.index.max()) if len(df1_r) > 0 and len(df2_r) > 0 else 0
+    fig_price.layout.shapes[0].update(x0=max_idx, x1=max_idx)
+    fig_price.layout.annotations[0].update(x=max_idx)
     
-    st.plotly_chart(fig_price, use_container_width=True)
+    st.plotly_chart(fig_price, use_container_width=True, key="fig_price")
 
 # ================= TAB: ANALYTICS =================
 with tab_analytics:
@@ -356,156 +492,196 @@ with tab_analytics:
         )
 
     st.subheader("Spread")
-    fig_spread = go.Figure()
-    fig_spread.add_trace(go.Scatter(
-        x=spr.index,
-        y=spr,
-        name="Spread",
-        line=dict(color='#2ca02c', width=2),
-        fill='tozeroy',
-        fillcolor='rgba(44, 160, 44, 0.1)',
-        hovertemplate='<b>Spread</b><br>' +
-                      'Index: %{x}<br>' +
-                      'Spread: %{y:.4f}<br>' +
-                      '<extra></extra>'
-    ))
-    # Add zero reference line
-    fig_spread.add_hline(
-        y=0,
-        line_dash="dash",
-        line_color="gray",
-        opacity=0.5,
-        annotation_text="Zero"
-    )
-    # Add annotation for current spread
-    if len(spr) > 0:
-        current_spread = spr.iloc[-1]
-        mean_spread = spr.mean()
+    def build_spread_figure():
+        fig_spread = go.Figure()
+        fig_spread.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name="Spread",
+            line=dict(color='#2ca02c', width=2),
+            fill='tozeroy',
+            fillcolor='rgba(44, 160, 44, 0.1)',
+            hovertemplate='<b>Spread</b><br>' +
+                          'Index: %{x}<br>' +
+                          'Spread: %{y:.4f}<br>' +
+                          '<extra></extra>'
+        ))
+        # Add zero reference line
+        fig_spread.add_hline(
+            y=0,
+            line_dash="dash",
+            line_color="gray",
+            opacity=0.5,
+            annotation_text="Zero"
+        )
+        # Placeholder for the current spread annotation
         fig_spread.add_annotation(
+            x=0,
+            y=0,
+            text="",
+            visible=False,
+            showarrow=True,
+            arrowhead=2,
+            bgcolor="rgba(255,255,255,0.8)"
+        )
+        fig_spread.update_layout(
+            xaxis_title="Index",
+            yaxis_title="Spread",
+            hovermode="x unified",
+            template="plotly_white",
+            height=400,
+            showlegend=False
+        )
+        return fig_spread
+
+    fig_spread = cached_figure("spread", (), build_spread_figure)
+    fig_spread.data[0].update(x=spr_x, y=spr_y)
+    # Update annotation for current spread
+    if len(spr) > 0:
+        mean_spread = spr_arr.mean()
+        fig_spread.layout.annotations[-1].update(
             x=spr.index[-1],
             y=current_spread,
             text=f"Current: {current_spread:.4f}<br>Mean: {mean_spread:.4f}",
+            visible=True
+        )
+    st.plotly_chart(fig_spread, use_container_width=True, key="fig_spread")
+
+    st.subheader("Z-Score")
+    def build_z_figure():
+        fig_z = go.Figure()
+    
+        # Add z-score line
+        fig_z.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name="Z-Score",
+            line=dict(color='#9467bd', width=2),
+            hovertemplate='<b>Z-Score</b><br>' +
+                          'Index: %{x}<br>' +
+                          'Z-Score: %{y:.2f}<br>' +
+                          '<extra></extra>'
+        ))
+    
+        # Add threshold lines and shaded regions
+        fig_z.add_hline(y=2, line_dash="dash", line_color="red", line_width=2, annotation_text="+2σ")
+        fig_z.add_hline(y=-2, line_dash="dash", line_color="red", line_width=2, annotation_text="-2σ")
+        fig_z.add_hline(y=1, line_dash="dot", line_color="orange", line_width=1, opacity=0.7, annotation_text="+1σ")
+        fig_z.add_hline(y=-1, line_dash="dot", line_color="orange", line_width=1, opacity=0.7, annotation_text="-1σ")
+    
+        # Add shaded regions
+        fig_z.add_hrect(y0=2, y1=10, fillcolor="red", opacity=0.1, layer="below", line_width=0)
+        fig_z.add_hrect(y0=1, y1=2, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
+        fig_z.add_hrect(y0=-1, y1=1, fillcolor="green", opacity=0.1, layer="below", line_width=0)
+        fig_z.add_hrect(y0=-2, y1=-1, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
+        fig_z.add_hrect(y0=-10, y1=-2, fillcolor="red", opacity=0.1, layer="below", line_width=0)
+    
+        # Placeholder for the current value annotation
+        fig_z.add_annotation(
+            x=0,
+            y=0,
+            text="",
+            visible=False,
             showarrow=True,
             arrowhead=2,
             bgcolor="rgba(255,255,255,0.8)"
         )
-    fig_spread.update_layout(
-        xaxis_title="Index",
-        yaxis_title="Spread",
-        hovermode="x unified",
-        template="plotly_white",
-        height=400,
-        showlegend=False
-    )
-    st.plotly_chart(fig_spread, use_container_width=True)
+    
+        fig_z.update_layout(
+            xaxis_title="Index",
+            yaxis_title="Z-Score",
+            hovermode="x unified",
+            template="plotly_white",
+            height=400,
+            showlegend=False
+        )
+        return fig_z
 
-    st.subheader("Z-Score")
-    fig_z = go.Figure()
-    
-    # Add z-score line
-    fig_z.add_trace(go.Scatter(
-        x=zs.index,
-        y=zs,
-        name="Z-Score",
-        line=dict(color='#9467bd', width=2),
-        hovertemplate='<b>Z-Score</b><br>' +
-                      'Index: %{x}<br>' +
-                      'Z-Score: %{y:.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Add threshold lines and shaded regions
-    fig_z.add_hline(y=2, line_dash="dash", line_color="red", line_width=2, annotation_text="+2σ")
-    fig_z.add_hline(y=-2, line_dash="dash", line_color="red", line_width=2, annotation_text="-2σ")
-    fig_z.add_hline(y=1, line_dash="dot", line_color="orange", line_width=1, opacity=0.7, annotation_text="+1σ")
-    fig_z.add_hline(y=-1, line_dash="dot", line_color="orange", line_width=1, opacity=0.7, annotation_text="-1σ")
-    
-    # Add shaded regions
-    fig_z.add_hrect(y0=2, y1=10, fillcolor="red", opacity=0.1, layer="below", line_width=0)
-    fig_z.add_hrect(y0=1, y1=2, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
-    fig_z.add_hrect(y0=-1, y1=1, fillcolor="green", opacity=0.1, layer="below", line_width=0)
-    fig_z.add_hrect(y0=-2, y1=-1, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
-    fig_z.add_hrect(y0=-10, y1=-2, fillcolor="red", opacity=0.1, layer="below", line_width=0)
-    
-    # Add annotation for current z-score
+    fig_z = cached_figure("z", (), build_z_figure)
+    fig_z.data[0].update(x=zs_x, y=zs_y)
+    
+    # Update annotation for current z-score
     if len(zs) > 0:
-        current_z_val = zs.iloc[-1]
+        current_z_val = current_z
         interpretation = "Extreme" if abs(current_z_val) > 2 else "Warning" if abs(current_z_val) > 1 else "Normal"
-        fig_z.add_annotation(
+        fig_z.layout.annotations[-1].update(
             x=zs.index[-1],
             y=current_z_val,
             text=f"Current: {current_z_val:.2f}<br>{interpretation}",
+            visible=True
+        )
+    st.plotly_chart(fig_z, use_container_width=True, key="fig_z")
+
+    st.subheader("Rolling Correlation")
+    def build_corr_figure():
+        fig_corr = go.Figure()
+        fig_corr.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name="Correlation",
+            line=dict(color='#17becf', width=2),
+            hovertemplate='<b>Rolling Correlation</b><br>' +
+                          'Index: %{x}<br>' +
+                          'Correlation: %{y:.3f}<br>' +
+                          f'Window: {rolling_window}<br>' +
+                          '<extra></extra>'
+        ))
+    
+        # Add reference lines
+        fig_corr.add_hline(y=0.8, line_dash="dash", line_color="green", line_width=1, opacity=0.7, annotation_text="Strong (0.8)")
+        fig_corr.add_hline(y=0.5, line_dash="dot", line_color="orange", line_width=1, opacity=0.7, annotation_text="Moderate (0.5)")
+    
+        # Add shaded regions
+        fig_corr.add_hrect(y0=0.8, y1=1.0, fillcolor="green", opacity=0.1, layer="below", line_width=0)
+        fig_corr.add_hrect(y0=0.5, y1=0.8, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
+        fig_corr.add_hrect(y0=0.0, y1=0.5, fillcolor="red", opacity=0.1, layer="below", line_width=0)
+    
+        # Placeholder for the current value annotation
+        fig_corr.add_annotation(
+            x=0,
+            y=0,
+            text="",
+            visible=False,
             showarrow=True,
             arrowhead=2,
             bgcolor="rgba(255,255,255,0.8)"
         )
     
-    fig_z.update_layout(
-        xaxis_title="Index",
-        yaxis_title="Z-Score",
-        hovermode="x unified",
-        template="plotly_white",
-        height=400,
-        showlegend=False
-    )
-    st.plotly_chart(fig_z, use_container_width=True)
+        fig_corr.update_layout(
+            xaxis_title="Index",
+            yaxis_title="Rolling Correlation",
+            yaxis_range=[-0.1, 1.1],
+            hovermode="x unified",
+            template="plotly_white",
+            height=400,
+            showlegend=False
+        )
+        return fig_corr
 
-    st.subheader("Rolling Correlation")
-    fig_corr = go.Figure()
-    fig_corr.add_trace(go.Scatter(
-        x=corr.index,
-        y=corr,
-        name="Correlation",
-        line=dict(color='#17becf', width=2),
-        hovertemplate='<b>Rolling Correlation</b><br>' +
-                      'Index: %{x}<br>' +
-                      'Correlation: %{y:.3f}<br>' +
-                      f'Window: {rolling_window}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Add reference lines
-    fig_corr.add_hline(y=0.8, line_dash="dash", line_color="green", line_width=1, opacity=0.7, annotation_text="Strong (0.8)")
-    fig_corr.add_hline(y=0.5, line_dash="dot", line_color="orange", line_width=1, opacity=0.7, annotation_text="Moderate (0.5)")
-    
-    # Add shaded regions
-    fig_corr.add_hrect(y0=0.8, y1=1.0, fillcolor="green", opacity=0.1, layer="below", line_width=0)
-    fig_corr.add_hrect(y0=0.5, y1=0.8, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
-    fig_corr.add_hrect(y0=0.0, y1=0.5, fillcolor="red", opacity=0.1, layer="below", line_width=0)
-    
-    # Add annotation for current correlation
+    fig_corr = cached_figure("corr", (rolling_window,), build_corr_figure)
+    fig_corr.data[0].update(x=corr_x, y=corr_y)
+    
+    # Update annotation for current correlation
     if len(corr) > 0:
-        current_corr_val = corr.iloc[-1]
+        current_corr_val = current_corr
         if current_corr_val > 0.8:
             interpretation = "Strong"
         elif current_corr_val > 0.5:
             interpretation = "Moderate"
         else:
             interpretation = "Weak"
-        fig_corr.add_annotation(
+        fig_corr.layout.annotations[-1].update(
             x=corr.index[-1],
             y=current_corr_val,
             text=f"Current: {current_corr_val:.3f}<br>{interpretation}",
-            showarrow=True,
-            arrowhead=2,
-            bgcolor="rgba(255,255,255,0.8)"
+            visible=True
         )
-    
-    fig_corr.update_layout(
-        xaxis_title="Index",
-        yaxis_title="Rolling Correlation",
-        yaxis_range=[-0.1, 1.1],
-        hovermode="x unified",
-        template="plotly_white",
-        height=400,
-        showlegend=False
-    )
-    st.plotly_chart(fig_corr, use_container_width=True)
+    st.plotly_chart(fig_corr, use_container_width=True, key="fig_corr")
 
     if run_adf:
         st.divider()
         st.subheader("Augmented Dickey-Fuller (ADF) Test")
-        stat, pval = adf_test(spr)
+        stat, pval = cached_adf_test(spr_arr)
         
         # Format ADF results as a card
         adf_container = st.container()
@@ -545,77 +721,94 @@ with tab_analytics:
                 "A stationary spread indicates the pair relationship is stable over time."
             )
 
-    # Prepare export data
-    export_df = pd.DataFrame({
-        "price_1": df1_r['price'],
-        "price_2": df2_r['price'],
-        "spread": spr,
-        "z_score": zs,
-        "correlation": corr
-    })
-    
-    # Generate filename with metadata
-    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    base_filename = f"analytics_{symbol_1}_{symbol_2}_{timeframe}_{timestamp_str}"
-    
     # Export options
     st.subheader("Export Data")
-    export_col1, export_col2, export_col3 = st.columns(3)
-    
-    with export_col1:
-        csv_data = export_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "📥 Download CSV",
-            csv_data,
-            f"{base_filename}.csv",
-            "text/csv",
+    # Export files are only generated on request; openpyxl in particular is
+    # too slow to run on every refresh. The bytes are built once per click
+    # and kept in session_state, so the download buttons survive
+    # auto-refresh reruns without rebuilding anything.
+    prep_col, discard_col = st.columns(2)
+    with prep_col:
+        prepare_clicked = st.button(
+            "Refresh export files" if st.session_state.exports else "Prepare export files",
             use_container_width=True
         )
-    
-    with export_col2:
-        json_data = export_df.to_json(orient='records', indent=2).encode('utf-8')
-        st.download_button(
-            "📥 Download JSON",
-            json_data,
-            f"{base_filename}.json",
-            "application/json",
+    with discard_col:
+        discard_clicked = st.button(
+            "Discard export files",
             use_container_width=True
         )
-    
-    with export_col3:
+    if discard_clicked:
+        st.session_state.exports = None
+    elif prepare_clicked:
+        # Prepare export data
+        export_df = pd.DataFrame({
+            "price_1": df1_r['price'],
+            "price_2": df2_r['price'],
+            "spread": spr,
+            "z_score": zs,
+            "correlation": corr
+        })
+        # Generate filename with metadata
+        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        exports = {
+            "base_filename": f"analytics_{symbol_1}_{symbol_2}_{timeframe}_{timestamp_str}",
+            "csv": build_csv_export(export_df),
+            "json": build_json_export(export_df),
+            "excel": None,
+            "excel_error": None,
+        }
         try:
             # Try Excel export (requires openpyxl)
-            excel_buffer = io.BytesIO()
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                export_df.to_excel(writer, index=False, sheet_name='Analytics')
-            excel_data = excel_buffer.getvalue()
-            st.download_button(
-                "📥 Download Excel",
-                excel_data,
-                f"{base_filename}.xlsx",
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+            exports["excel"] = build_excel_export(export_df)
         except ImportError:
-            st.info("💡 Excel export requires 'openpyxl'. Install with: `pip install openpyxl`")
+            exports["excel_error"] = "💡 Excel export requires 'openpyxl'. Install with: `pip install openpyxl`"
+        except Exception as e:
+            exports["excel_error"] = f"Excel export unavailable: {str(e)}"
+        st.session_state.exports = exports
+
+    exports = st.session_state.exports
+    if exports is not None:
+        base_filename = exports["base_filename"]
+        export_col1, export_col2, export_col3 = st.columns(3)
+    
+        with export_col1:
             st.download_button(
-                "📥 Download Excel (disabled)",
-                b"",
-                f"{base_filename}.xlsx",
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True,
-                disabled=True
+                "📥 Download CSV",
+                exports["csv"],
+                f"{base_filename}.csv",
+                "text/csv",
+                use_container_width=True
             )
-        except Exception as e:
-            st.warning(f"Excel export unavailable: {str(e)}")
+    
+        with export_col2:
             st.download_button(
-                "📥 Download Excel (disabled)",
-                b"",
-                f"{base_filename}.xlsx",
-                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True,
-                disabled=True
+                "📥 Download JSON",
+                exports["json"],
+                f"{base_filename}.json",
+                "application/json",
+                use_container_width=True
             )
+    
+        with export_col3:
+            if exports["excel"] is not None:
+                st.download_button(
+                    "📥 Download Excel",
+                    exports["excel"],
+                    f"{base_filename}.xlsx",
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+            else:
+                st.info(exports["excel_error"])
+                st.download_button(
+                    "📥 Download Excel (disabled)",
+                    b"",
+                    f"{base_filename}.xlsx",
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True,
+                    disabled=True
+                )
 
 # ================= TAB: ALERTS =================
 with tab_alerts:
@@ -627,7 +820,6 @@ with tab_alerts:
         st.write("")  # Spacing
         st.write("")  # Spacing
     
-    current_z = zs.iloc[-1]
     current_alert_state = abs(current_z) > threshold
     
     # Check for new alert (only log when crossing threshold, not when staying above)
@@ -676,43 +868,44 @@ with tab_alerts:
     
     # Z-Score history chart with threshold bands
     st.subheader("Z-Score History")
-    fig_alert_z = go.Figure()
-    
-    # Add z-score line
-    fig_alert_z.add_trace(go.Scatter(
-        x=zs.index,
-        y=zs,
-        name="Z-Score",
-        line=dict(color='#9467bd', width=2),
-        hovertemplate='<b>Z-Score</b><br>' +
-                      'Index: %{x}<br>' +
-                      'Z-Score: %{y:.2f}<br>' +
-                      '<extra></extra>'
-    ))
-    
-    # Add threshold bands
-    fig_alert_z.add_hline(y=threshold, line_dash="dash", line_color="red", line_width=2, 
-                          annotation_text=f"+{threshold:.1f}σ", annotation_position="right")
-    fig_alert_z.add_hline(y=-threshold, line_dash="dash", line_color="red", line_width=2,
-                          annotation_text=f"-{threshold:.1f}σ", annotation_position="right")
-    fig_alert_z.add_hline(y=threshold * 0.7, line_dash="dot", line_color="orange", line_width=1,
-                          opacity=0.7, annotation_text=f"Warning +{threshold * 0.7:.1f}σ")
-    fig_alert_z.add_hline(y=-threshold * 0.7, line_dash="dot", line_color="orange", line_width=1,
-                          opacity=0.7, annotation_text=f"Warning -{threshold * 0.7:.1f}σ")
-    
-    # Add shaded regions
-    fig_alert_z.add_hrect(y0=threshold, y1=10, fillcolor="red", opacity=0.15, layer="below", line_width=0)
-    fig_alert_z.add_hrect(y0=-threshold, y1=-10, fillcolor="red", opacity=0.15, layer="below", line_width=0)
-    fig_alert_z.add_hrect(y0=threshold * 0.7, y1=threshold, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
-    fig_alert_z.add_hrect(y0=-threshold, y1=-threshold * 0.7, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
-    fig_alert_z.add_hrect(y0=-threshold * 0.7, y1=threshold * 0.7, fillcolor="green", opacity=0.1, layer="below", line_width=0)
-    
-    # Highlight current value
-    if len(zs) > 0:
+    def build_alert_z_figure():
+        fig_alert_z = go.Figure()
+    
+        # Add z-score line
+        fig_alert_z.add_trace(go.Scatter(
+            x=[],
+            y=[],
+            name="Z-Score",
+            line=dict(color='#9467bd', width=2),
+            hovertemplate='<b>Z-Score</b><br>' +
+                          'Index: %{x}<br>' +
+                          'Z-Score: %{y:.2f}<br>' +
+                          '<extra></extra>'
+        ))
+    
+        # Add threshold bands
+        fig_alert_z.add_hline(y=threshold, line_dash="dash", line_color="red", line_width=2, 
+                              annotation_text=f"+{threshold:.1f}σ", annotation_position="right")
+        fig_alert_z.add_hline(y=-threshold, line_dash="dash", line_color="red", line_width=2,
+                              annotation_text=f"-{threshold:.1f}σ", annotation_position="right")
+        fig_alert_z.add_hline(y=threshold * 0.7, line_dash="dot", line_color="orange", line_width=1,
+                              opacity=0.7, annotation_text=f"Warning +{threshold * 0.7:.1f}σ")
+        fig_alert_z.add_hline(y=-threshold * 0.7, line_dash="dot", line_color="orange", line_width=1,
+                              opacity=0.7, annotation_text=f"Warning -{threshold * 0.7:.1f}σ")
+    
+        # Add shaded regions
+        fig_alert_z.add_hrect(y0=threshold, y1=10, fillcolor="red", opacity=0.15, layer="below", line_width=0)
+        fig_alert_z.add_hrect(y0=-threshold, y1=-10, fillcolor="red", opacity=0.15, layer="below", line_width=0)
+        fig_alert_z.add_hrect(y0=threshold * 0.7, y1=threshold, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
+        fig_alert_z.add_hrect(y0=-threshold, y1=-threshold * 0.7, fillcolor="orange", opacity=0.1, layer="below", line_width=0)
+        fig_alert_z.add_hrect(y0=-threshold * 0.7, y1=threshold * 0.7, fillcolor="green", opacity=0.1, layer="below", line_width=0)
+    
+        # Placeholder for the current value highlight
         fig_alert_z.add_annotation(
-            x=zs.index[-1],
-            y=current_z,
-            text=f"Current: {current_z:.2f}",
+            x=0,
+            y=0,
+            text="",
+            visible=False,
             showarrow=True,
             arrowhead=2,
             bgcolor="rgba(255,255,255,0.9)",
@@ -720,22 +913,35 @@ with tab_alerts:
             borderwidth=1
         )
     
-    fig_alert_z.update_layout(
-        xaxis_title="Index",
-        yaxis_title="Z-Score",
-        hovermode="x unified",
-        template="plotly_white",
-        height=400,
-        showlegend=False
-    )
-    st.plotly_chart(fig_alert_z, use_container_width=True)
+        fig_alert_z.update_layout(
+            xaxis_title="Index",
+            yaxis_title="Z-Score",
+            hovermode="x unified",
+            template="plotly_white",
+            height=400,
+            showlegend=False
+        )
+        return fig_alert_z
+
+    fig_alert_z = cached_figure("alert_z", (threshold,), build_alert_z_figure)
+    fig_alert_z.data[0].update(x=zs_x, y=zs_y)
+    
+    # Highlight current value
+    if len(zs) > 0:
+        fig_alert_z.layout.annotations[-1].update(
+            x=zs.index[-1],
+            y=current_z,
+            text=f"Current: {current_z:.2f}",
+            visible=True
+        )
+    st.plotly_chart(fig_alert_z, use_container_width=True, key="fig_alert_z")
     
     # Alert log
     st.subheader(f"Alert Log ({len(st.session_state.alert_log)} alerts)")
     
     if len(st.session_state.alert_log) > 0:
         # Show recent alerts (last 10)
-        recent_alerts = st.session_state.alert_log[-10:]
+        recent_alerts = list(st.session_state.alert_log)[-10:]
         recent_alerts.reverse()  # Show most recent first
         
         for alert in recent_alerts:
@@ -748,7 +954,7 @@ with tab_alerts:
         
         # Clear log button
         if st.button("Clear Alert Log", use_container_width=True):
-            st.session_state.alert_log = []
+            st.session_state.alert_log.clear()
             st.rerun()
     else:
         st.info("No alerts triggered yet. Alerts will appear here when z-score exceeds the threshold.")
@@ -768,8 +974,3 @@ with tab_upload:
     Uploaded OHLC data is treated as a first-class data source and passed through
     the same analytics pipeline as live market data.
     """)
-
-# ---------------- AUTO-REFRESH HANDLING (Live Mode Only) ----------------
-if data_mode == "Live Binance Data" and st.session_state.auto_refresh_enabled:
-    time.sleep(st.session_state.refresh_interval)
-    st.rerun()
@@ -1,10 +1,126 @@
+import atexit
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 import pandas as pd
 
 DB_NAME = "market_data.db"
 
+# journal_mode=WAL is stored in the database file, so it only needs to be
+# set once per path; the remaining PRAGMAs are per-connection.
+_wal_enabled = set()
+
+def _apply_pragmas(conn):
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA busy_timeout=5000")
+
 def get_connection():
-    return sqlite3.connect(DB_NAME, check_same_thread=False)
+    conn = sqlite3.connect(DB_NAME, check_same_thread=False, cached_statements=256)
+    if DB_NAME not in _wal_enabled:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_enabled.add(DB_NAME)
+    _apply_pragmas(conn)
+    return conn
+
+def _get_read_connection():
+    conn = sqlite3.connect(
+        f"file:{DB_NAME}?mode=ro", uri=True, check_same_thread=False, cached_statements=256
+    )
+    _apply_pragmas(conn)
+    conn.execute("PRAGMA query_only=1")
+    return conn
+
+# Read-only connections handed out to readers. Under WAL they neither block
+# on nor block the single writer connection.
+class _ReadPool:
+    def __init__(self, size):
+        self._size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self._size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    # Read-only connections can't create the file or schema,
+                    # so set it up before the first one is opened
+                    create_tables()
+                    conn = _get_read_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+_read_pool = _ReadPool(os.cpu_count() or 4)
+atexit.register(_read_pool.close)
+
+# Writers share one long-lived connection; readers use _read_pool
+_writer_conn = None
+_writer_lock = threading.Lock()
+
+@contextmanager
+def _write_transaction():
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            create_tables()
+            _writer_conn = get_connection()
+        conn = _writer_conn
+        # The connection's context manager commits on success and rolls
+        # back if the body raises
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+def checkpoint_wal():
+    # Fold the WAL back into the database and truncate it, so long uptimes
+    # don't leave readers scanning an ever-growing log
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = get_connection()
+        _writer_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def close_writer():
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is not None:
+            _writer_conn.close()
+            _writer_conn = None
+
+atexit.register(close_writer)
 
 BAR_TABLES = {
     "1s": "bars_1s",
@@ -12,108 +128,198 @@ BAR_TABLES = {
     "5m": "bars_5m",
 }
 
+# SQL text is kept constant so sqlite3's statement cache reuses the prepared
+# statements across flushes instead of re-parsing them
+INSERT_TICK_SQL = "INSERT INTO ticks (time, symbol, price, qty, ts_ms) VALUES (?, ?, ?, ?, ?)"
+
+UPSERT_BAR_SQL = {
+    tbl: f"""
+        INSERT INTO {tbl} (time, symbol, open, high, low, close, volume, ts_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(symbol, time) DO UPDATE SET
+            open=excluded.open,
+            high=excluded.high,
+            low=excluded.low,
+            close=excluded.close,
+            volume=excluded.volume
+    """
+    for tbl in BAR_TABLES.values()
+}
+
+# Flushes write partial bars built from their own ticks only; these fold
+# into whatever the bucket already holds (including rows written before a
+# restart) rather than replacing it
+MERGE_BAR_SQL = {
+    tbl: f"""
+        INSERT INTO {tbl} (time, symbol, open, high, low, close, volume, ts_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(symbol, time) DO UPDATE SET
+            high=max(high, excluded.high),
+            low=min(low, excluded.low),
+            close=excluded.close,
+            volume=volume + excluded.volume
+    """
+    for tbl in BAR_TABLES.values()
+}
+
+def ms_to_iso(ts_ms):
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).isoformat()
+
+def _iso_to_ms(time_str):
+    # Naive strings are UTC, matching the julianday backfill and load_ticks
+    dt = datetime.fromisoformat(time_str)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(round(dt.timestamp() * 1000))
+
+def _add_ts_ms_column(cursor, table):
+    # Databases created before ts_ms existed get the column added and
+    # backfilled from the ISO time text
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if "ts_ms" in columns:
+        return
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN ts_ms INTEGER")
+    cursor.execute(
+        f"UPDATE {table} SET ts_ms = CAST(ROUND((julianday(time) - 2440587.5) * 86400000) AS INTEGER)"
+    )
+
 def create_table():
     create_tables()
 
+# Schema setup runs once per process; readers no longer pay for it per query
+_tables_created = False
+_tables_lock = threading.Lock()
+
 def create_tables():
+    global _tables_created
+    with _tables_lock:
+        if _tables_created:
+            return
+        _create_tables()
+        _tables_created = True
+
+def _create_tables():
     conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ticks (
-            time TEXT,
-            symbol TEXT,
-            price REAL,
-            qty REAL
-        )
-    """)
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticks_symbol_time ON ticks(symbol, time)")
-    for tbl in BAR_TABLES.values():
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {tbl} (
-                time TEXT,
-                symbol TEXT,
-                open REAL,
-                high REAL,
-                low REAL,
-                close REAL,
-                volume REAL,
-                UNIQUE(symbol, time)
-            )
-        """)
-        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tbl}_symbol_time ON {tbl}(symbol, time)")
-    conn.commit()
-    conn.close()
+    try:
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ticks (
+                    time TEXT,
+                    symbol TEXT,
+                    price REAL,
+                    qty REAL,
+                    ts_ms INTEGER
+                )
+            """)
+            _add_ts_ms_column(cursor, "ticks")
+            # Readers filter ticks on ts_ms, so the old (symbol, time) index
+            # would only add work to every insert
+            cursor.execute("DROP INDEX IF EXISTS idx_ticks_symbol_time")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticks_symbol_ts ON ticks(symbol, ts_ms)")
+            # Retention pruning filters on ts_ms alone
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticks_ts ON ticks(ts_ms)")
+            for tbl in BAR_TABLES.values():
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {tbl} (
+                        time TEXT,
+                        symbol TEXT,
+                        open REAL,
+                        high REAL,
+                        low REAL,
+                        close REAL,
+                        volume REAL,
+                        ts_ms INTEGER,
+                        UNIQUE(symbol, time)
+                    )
+                """)
+                _add_ts_ms_column(cursor, tbl)
+                # UNIQUE(symbol, time) already gives SQLite an index on those columns;
+                # older databases also carried an explicit duplicate of it
+                cursor.execute(f"DROP INDEX IF EXISTS idx_{tbl}_symbol_time")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tbl}_symbol_ts ON {tbl}(symbol, ts_ms)")
+    finally:
+        conn.close()
 
 def insert_tick(time, symbol, price, qty):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO ticks VALUES (?, ?, ?, ?)",
-        (time, symbol, price, qty)
-    )
-    conn.commit()
-    conn.close()
+    with _write_transaction() as conn:
+        conn.execute(
+            INSERT_TICK_SQL,
+            (time, symbol, price, qty, _iso_to_ms(time))
+        )
+
+def _bar_rows(bars):
+    return [
+        (
+            b["time"],
+            b["symbol"],
+            b["open"],
+            b["high"],
+            b["low"],
+            b["close"],
+            b["volume"],
+            b["ts_ms"] if "ts_ms" in b else _iso_to_ms(b["time"]),
+        )
+        for b in bars
+    ]
 
 def insert_or_replace_bars(table_name, bars):
     if not bars:
         return
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.executemany(
-        f"""
-        INSERT INTO {table_name} (time, symbol, open, high, low, close, volume)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(symbol, time) DO UPDATE SET
-            open=excluded.open,
-            high=excluded.high,
-            low=excluded.low,
-            close=excluded.close,
-            volume=excluded.volume
-        """,
-        [
-            (
-                b["time"],
-                b["symbol"],
-                b["open"],
-                b["high"],
-                b["low"],
-                b["close"],
-                b["volume"],
-            )
-            for b in bars
-        ]
-    )
-    conn.commit()
-    conn.close()
+    with _write_transaction() as conn:
+        conn.executemany(UPSERT_BAR_SQL[table_name], _bar_rows(bars))
+
+def _tick_rows(ticks):
+    # Ticks carry their exchange timestamp as epoch ms in "ts"; the ISO text
+    # column is only derived here for readers of the old schema
+    return [(ms_to_iso(t["ts"]), t["symbol"], t["price"], t["qty"], t["ts"]) for t in ticks]
 
 def insert_ticks_bulk(ticks):
     if not ticks:
         return
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.executemany(
-        "INSERT INTO ticks (time, symbol, price, qty) VALUES (?, ?, ?, ?)",
-        [(t["time"], t["symbol"], t["price"], t["qty"]) for t in ticks]
-    )
-    conn.commit()
-    conn.close()
+    with _write_transaction() as conn:
+        conn.executemany(INSERT_TICK_SQL, _tick_rows(ticks))
+
+def store_flush(ticks, rows_by_table):
+    # Bar rows are (time, symbol, open, high, low, close, volume, ts_ms)
+    # tuples covering only this flush's ticks; they are merged into the
+    # stored bars. A flush's ticks and the bars built from them commit together,
+    # so each flush costs a single WAL commit and readers never see bars
+    # ahead of their ticks
+    if not ticks and not any(rows_by_table.values()):
+        return
+    with _write_transaction() as conn:
+        if ticks:
+            conn.executemany(INSERT_TICK_SQL, _tick_rows(ticks))
+        for table_name, rows in rows_by_table.items():
+            if rows:
+                conn.executemany(MERGE_BAR_SQL[table_name], rows)
+
+_PRUNE_CHUNK = 10000
+PRUNE_TICKS_SQL = (
+    "DELETE FROM ticks WHERE rowid IN "
+    f"(SELECT rowid FROM ticks WHERE ts_ms < ? LIMIT {_PRUNE_CHUNK})"
+)
 
 def prune_ticks_older_than(hours):
     if hours is None:
         return
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "DELETE FROM ticks WHERE time < datetime('now', ?)",
-        (f"-{int(hours)} hours",)
-    )
-    conn.commit()
-    conn.close()
+    # Cutoff is a plain bound on ts_ms, so each chunk is a range scan of
+    # idx_ticks_ts; deleting in chunks, each in its own short transaction,
+    # keeps WAL growth and writer lock hold times small
+    cutoff = int((time.time() - int(hours) * 3600) * 1000)
+    while True:
+        with _write_transaction() as conn:
+            deleted = conn.execute(PRUNE_TICKS_SQL, (cutoff,)).rowcount
+        if deleted < _PRUNE_CHUNK:
+            break
+
+def _parse_time(df):
+    # One vectorised epoch-ms conversion instead of parsing the ISO text
+    df["time"] = pd.to_datetime(df["ts_ms"].to_numpy(dtype="int64"), unit="ms", utc=True)
+    return df
 
 def load_ticks(symbol=None, since=None, limit=None):
-    # Ensure tables exist before attempting to read
-    create_tables()
-    conn = get_connection()
     query = "SELECT * FROM ticks"
     clauses = []
     params = []
@@ -121,31 +327,27 @@ def load_ticks(symbol=None, since=None, limit=None):
         clauses.append("symbol = ?")
         params.append(symbol)
     if since:
-        clauses.append("time >= ?")
-        params.append(since)
+        # since is an ISO string or datetime; naive values are taken as UTC
+        since = pd.Timestamp(since)
+        if since.tzinfo is None:
+            since = since.tz_localize("UTC")
+        clauses.append("ts_ms >= ?")
+        params.append(since.value // 1_000_000)
     if clauses:
         query += " WHERE " + " AND ".join(clauses)
-    query += " ORDER BY time ASC"
+    query += " ORDER BY ts_ms ASC"
     if limit:
         query += f" LIMIT {int(limit)}"
-    try:
-        df = pd.read_sql(query, conn, params=params)
-    except Exception:
-        conn.close()
-        return pd.DataFrame(columns=["time", "symbol", "price", "qty"])
-    finally:
+    with _read_pool.acquire() as conn:
         try:
-            conn.close()
+            return _parse_time(pd.read_sql(query, conn, params=params))
         except Exception:
-            pass
-    return df
+            return pd.DataFrame(columns=["time", "symbol", "price", "qty", "ts_ms"])
 
 def load_bars(timeframe, symbol=None, lookback=None):
     table = BAR_TABLES.get(timeframe)
     if not table:
-        return pd.DataFrame(columns=["time", "symbol", "open", "high", "low", "close", "volume"])
-    create_tables()
-    conn = get_connection()
+        return pd.DataFrame(columns=["time", "symbol", "open", "high", "low", "close", "volume", "ts_ms"])
     query = f"SELECT * FROM {table}"
     clauses = []
     params = []
@@ -153,19 +355,50 @@ def load_bars(timeframe, symbol=None, lookback=None):
         clauses.append("symbol = ?")
         params.append(symbol)
     if lookback:
-        clauses.append("time >= datetime('now', ?)")
-        params.append(f"-{int(lookback)} hours")
+        clauses.append("ts_ms >= ?")
+        params.append(int((time.time() - int(lookback) * 3600) * 1000))
     if clauses:
         query += " WHERE " + " AND ".join(clauses)
-    query += " ORDER BY time ASC"
-    try:
-        df = pd.read_sql(query, conn, params=params)
-    except Exception:
-        conn.close()
-        return pd.DataFrame(columns=["time", "symbol", "open", "high", "low", "close", "volume"])
-    finally:
+    query += " ORDER BY ts_ms ASC"
+    with _read_pool.acquire() as conn:
         try:
-            conn.close()
+            return _parse_time(pd.read_sql(query, conn, params=params))
         except Exception:
-            pass
-    return df
+            return pd.DataFrame(columns=["time", "symbol", "open", "high", "low", "close", "volume", "ts_ms"])
+
+# Both legs of a pair aligned in SQL: the self-join on ts_ms returns only the
+# buckets present for both symbols, using the (symbol, ts_ms) index on each
+# side. Each leg's bar columns carry a 1/2 suffix.
+_PAIR_BAR_COLUMNS = ["symbol", "open", "high", "low", "close", "volume"]
+
+PAIR_BARS_SQL = {
+    tbl: "SELECT a.time, a.ts_ms, "
+    + ", ".join(f"a.{c} AS {c}1" for c in _PAIR_BAR_COLUMNS) + ", "
+    + ", ".join(f"b.{c} AS {c}2" for c in _PAIR_BAR_COLUMNS)
+    + f"""
+        FROM {tbl} a
+        JOIN {tbl} b ON b.symbol = ? AND b.ts_ms = a.ts_ms
+        WHERE a.symbol = ? AND a.ts_ms >= ?
+        ORDER BY a.ts_ms ASC
+    """
+    for tbl in BAR_TABLES.values()
+}
+
+def load_pair_bars(timeframe, symbol_1, symbol_2, lookback=None):
+    empty = pd.DataFrame(
+        columns=["time", "ts_ms"]
+        + [f"{c}{n}" for n in (1, 2) for c in _PAIR_BAR_COLUMNS]
+    )
+    table = BAR_TABLES.get(timeframe)
+    if not table:
+        return empty
+    since = int((time.time() - int(lookback) * 3600) * 1000) if lookback else 0
+    with _read_pool.acquire() as conn:
+        try:
+            df = pd.read_sql(PAIR_BARS_SQL[table], conn, params=(symbol_2, symbol_1, since))
+        except sqlite3.OperationalError as e:
+            # Only a missing table means "no data yet"; anything else is a bug
+            if "no such table" not in str(e):
+                raise
+            return empty
+    return _parse_time(df)
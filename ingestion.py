@@ -1,148 +1,358 @@
 import json
+import random
+import socket
 import threading
 import time
-import queue
+from collections import deque
 import websocket
-import pandas as pd
-from datetime import datetime, timezone
+try:
+    # C JSON parser for the per-trade hot path (optional)
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+import numpy as np
 from database import (
+    ms_to_iso,
     create_tables,
-    insert_ticks_bulk,
-    insert_or_replace_bars,
+    store_flush,
+    checkpoint_wal,
     prune_ticks_older_than,
     BAR_TABLES,
 )
 
-_tick_queue = queue.Queue(maxsize=10_000)
+# Bounded deque: append/popleft are atomic, and maxlen drops the oldest tick
+# when the flush thread falls behind. _tick_wake wakes the flush thread.
+_tick_queue = deque(maxlen=10_000)
+_tick_wake = threading.Event()
 _flush_thread = None
-_stream_threads = {}
-_stop_flags = {}
+
+# All symbols share one combined-stream websocket. _symbols is the set of
+# subscribed symbols; start/stop_stream update it and send SUBSCRIBE or
+# UNSUBSCRIBE frames over the open socket.
+_symbols = set()
+_symbols_lock = threading.Lock()
+# Serialises start/stop_stream so concurrent sessions can't spawn a second
+# socket or flush thread; taken before _symbols_lock, never inside it
+_stream_lock = threading.Lock()
+_socket_thread = None
+_socket_stop = threading.Event()
+_ws = None
+_request_id = 0
 
 def _on_message(ws, message):
-    data = json.loads(message)
+    data = _json_loads(message)
+    # Combined streams wrap the trade under "data"; subscription replies
+    # carry no trade payload
+    data = data.get("data", data)
+    if "T" not in data:
+        return
     tick = {
-        "time": datetime.fromtimestamp(data["T"] / 1000, tz=timezone.utc).isoformat(),
+        "ts": data["T"],
         "symbol": data["s"].lower(),
         "price": float(data["p"]),
         "qty": float(data["q"])
     }
-    try:
-        _tick_queue.put_nowait(tick)
-    except queue.Full:
-        # Drop oldest if queue is full to keep moving
+    _tick_queue.append(tick)
+    if not _tick_wake.is_set():
+        _tick_wake.set()
+
+# The numeric value differs by architecture, so it is only used when the
+# socket module exports it -- which stock CPython does not, so in practice
+# busy-polling is never enabled
+_SO_BUSY_POLL = getattr(socket, "SO_BUSY_POLL", None)
+
+def _socket_options():
+    # TCP_NODELAY for the small trade frames (websocket-client also sets it
+    # by default). SO_BUSY_POLL is only added when the interpreter exposes
+    # the constant and the kernel accepts it (raising it usually needs
+    # CAP_NET_ADMIN); it is probed once on a throwaway socket so a refused
+    # option can't fail every connect.
+    opts = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+    if _SO_BUSY_POLL is not None:
+        probe = socket.socket()
         try:
-            _tick_queue.get_nowait()
-            _tick_queue.put_nowait(tick)
-        except queue.Empty:
+            probe.setsockopt(socket.SOL_SOCKET, _SO_BUSY_POLL, 50)
+            opts.append((socket.SOL_SOCKET, _SO_BUSY_POLL, 50))
+        except OSError:
             pass
+        finally:
+            probe.close()
+    return tuple(opts)
+
+_SOCKOPT = _socket_options()
+
+def _send_subscription(method, symbols):
+    # Returns False when there is no open socket; the next connection picks
+    # up the current symbol set instead
+    global _request_id
+    ws = _ws
+    if ws is None or ws.sock is None or not ws.sock.connected:
+        return False
+    with _symbols_lock:
+        _request_id += 1
+        request_id = _request_id
+    try:
+        ws.send(json.dumps({
+            "method": method,
+            "params": [f"{s}@trade" for s in symbols],
+            "id": request_id,
+        }))
+    except Exception:
+        return False
+    return True
 
-def _start_socket(symbol, stop_event):
-    url = f"wss://fstream.binance.com/ws/{symbol}@trade"
+def _start_combined_socket(stop_event):
+    global _ws
     backoff = 1
     while not stop_event.is_set():
+        with _symbols_lock:
+            symbols = sorted(_symbols)
+        if not symbols:
+            break
+        url = "wss://fstream.binance.com/stream?streams=" + "/".join(f"{s}@trade" for s in symbols)
+
+        def _on_open(ws, url_symbols=frozenset(symbols)):
+            # Symbols added or stopped while the socket was connecting; the
+            # (UN)SUBSCRIBE sent then was dropped because it wasn't open yet
+            with _symbols_lock:
+                missing = sorted(_symbols - url_symbols)
+                removed = sorted(url_symbols - _symbols)
+            if missing:
+                _send_subscription("SUBSCRIBE", missing)
+            if removed:
+                _send_subscription("UNSUBSCRIBE", removed)
+
+        ws = None
         try:
             ws = websocket.WebSocketApp(
                 url,
+                on_open=_on_open,
                 on_message=_on_message,
                 on_error=lambda ws, err: None,
                 on_close=lambda ws, *args: None,
             )
-            ws.run_forever(ping_interval=20, ping_timeout=10)
-            backoff = min(backoff * 2, 30)
+            _ws = ws
+            connected_at = time.monotonic()
+            ws.run_forever(sockopt=_SOCKOPT, ping_interval=20, ping_timeout=10)
+            # A connection that stayed up was a transient drop, not a
+            # failing endpoint: reconnect quickly
+            if time.monotonic() - connected_at > 60:
+                backoff = 1
+            else:
+                backoff = min(backoff * 2, 30)
         except Exception:
             backoff = min(backoff * 2, 30)
-        time.sleep(backoff)
+        finally:
+            if _ws is ws:
+                _ws = None
+        if stop_event.is_set():
+            break
+        # Jitter keeps clients from reconnecting in lockstep after an
+        # exchange-wide disconnect
+        time.sleep(random.uniform(0.5 * backoff, backoff))
 
-def _ensure_flush_thread(batch_size=200, flush_interval=1.0, retention_hours=6):
+# Disk writes stay on a plain thread: sqlite3 has no async I/O path (aiosqlite
+# runs the same blocking calls on a worker thread), so an event loop would not
+# batch the COMMIT fsync any further. Batching happens here instead: one
+# flush per flush_interval, up to batch_size ticks each.
+def _ensure_flush_thread(batch_size=5000, flush_interval=1.0, retention_hours=6):
     global _flush_thread
     if _flush_thread and _flush_thread.is_alive():
         return
 
     def _flush_loop():
         create_tables()
-        last_prune = time.time()
+        last_prune = last_checkpoint = time.time()
         while True:
-            batch = []
+            # Wait for the first tick, let the rest of the flush window fill
+            # the queue, then drain it
             start = time.time()
-            while len(batch) < batch_size and time.time() - start < flush_interval:
-                try:
-                    item = _tick_queue.get(timeout=flush_interval)
-                    batch.append(item)
-                except queue.Empty:
-                    break
+            if not _tick_queue:
+                _tick_wake.wait(flush_interval)
+            _tick_wake.clear()
+            if _tick_queue and len(_tick_queue) < batch_size:
+                time.sleep(max(0.0, flush_interval - (time.time() - start)))
+            batch = []
+            try:
+                while len(batch) < batch_size:
+                    batch.append(_tick_queue.popleft())
+            except IndexError:
+                pass
             if batch:
-                insert_ticks_bulk(batch)
-                _aggregate_and_store_bars(batch)
+                store_flush(batch, _aggregate_bars(batch))
             if retention_hours and time.time() - last_prune > 300:
                 prune_ticks_older_than(retention_hours)
                 last_prune = time.time()
+            if time.time() - last_checkpoint > 300:
+                checkpoint_wal()
+                last_checkpoint = time.time()
 
     _flush_thread = threading.Thread(target=_flush_loop, daemon=True)
     _flush_thread.start()
 
-def _aggregate_and_store_bars(batch):
-    if not batch:
-        return
-    df = pd.DataFrame(batch)
-    if df.empty:
-        return
-    df["time"] = pd.to_datetime(df["time"], utc=True)
-    df.set_index("time", inplace=True)
-    rules = {"1s": "1S", "1m": "1T", "5m": "5T"}
-    for tf, rule in rules.items():
-        table = BAR_TABLES[tf]
-        grouped = (
-            df.groupby("symbol")
-              .resample(rule)
-              .agg(
-                  open=("price", "first"),
-                  high=("price", "max"),
-                  low=("price", "min"),
-                  close=("price", "last"),
-                  volume=("qty", "sum"),
-              )
-              .dropna()
-        )
-        if grouped.empty:
+BAR_PERIODS = {"1s": 1, "1m": 60, "5m": 300}
+# Up to this many ticks, a plain dict pass beats NumPy's setup overhead. A
+# normal one-second flush stays under it; a backlog drained after a stall
+# (up to batch_size ticks) takes the NumPy path
+_SMALL_BATCH = 1000
+
+def _bars_python(batch):
+    # (symbol, second) -> [open, high, low, close, volume, open_ts, close_ts]
+    aggs = {}
+    for t in batch:
+        p = t["price"]
+        ms = t["ts"]
+        key = (t["symbol"], ms // 1000)
+        agg = aggs.get(key)
+        if agg is None:
+            aggs[key] = [p, p, p, p, t["qty"], ms, ms]
             continue
-        grouped = grouped.reset_index()
-        records = grouped.to_dict("records")
-        bars = []
-        for rec in records:
-            bars.append(
-                {
-                    "time": rec["time"].isoformat(),
-                    "symbol": rec["symbol"],
-                    "open": rec["open"],
-                    "high": rec["high"],
-                    "low": rec["low"],
-                    "close": rec["close"],
-                    "volume": rec["volume"],
-                }
-            )
-        insert_or_replace_bars(table, bars)
+        if p > agg[1]:
+            agg[1] = p
+        if p < agg[2]:
+            agg[2] = p
+        agg[4] += t["qty"]
+        if ms < agg[5]:
+            agg[0] = p
+            agg[5] = ms
+        if ms >= agg[6]:
+            agg[3] = p
+            agg[6] = ms
+    return [
+        (ms_to_iso(sec * 1000), symbol, a[0], a[1], a[2], a[3], a[4], sec * 1000)
+        for (symbol, sec), a in aggs.items()
+    ]
+
+def _bars_numpy(batch):
+    ts = np.fromiter((t["ts"] for t in batch), dtype=np.int64, count=len(batch))
+    price = np.fromiter((t["price"] for t in batch), dtype=np.float64, count=len(batch))
+    qty = np.fromiter((t["qty"] for t in batch), dtype=np.float64, count=len(batch))
+    symbols, sym_codes = np.unique([t["symbol"] for t in batch], return_inverse=True)
+    buckets = ts // 1000
+    # Sort by (symbol, second, time) so each bar is a contiguous run
+    order = np.lexsort((ts, buckets, sym_codes))
+    b = buckets[order]
+    c = sym_codes[order]
+    p = price[order]
+    starts = np.flatnonzero(np.r_[True, (b[1:] != b[:-1]) | (c[1:] != c[:-1])])
+    ends = np.r_[starts[1:], len(p)] - 1
+    bucket_ms = (b[starts] * 1000).tolist()
+    return list(zip(
+        [ms_to_iso(ms) for ms in bucket_ms],
+        symbols[c[starts]].tolist(),
+        p[starts].tolist(),
+        np.maximum.reduceat(p, starts).tolist(),
+        np.minimum.reduceat(p, starts).tolist(),
+        p[ends].tolist(),
+        np.add.reduceat(qty[order], starts).tolist(),
+        bucket_ms,
+    ))
+
+def _rollup(rows, period_ms):
+    # Merge finer bars into period_ms buckets; children are keyed by their
+    # start time, so open/close follow the earliest/latest child
+    aggs = {}
+    for _, symbol, o, h, l, c, v, ms in rows:
+        key = (symbol, ms // period_ms)
+        agg = aggs.get(key)
+        if agg is None:
+            aggs[key] = [o, h, l, c, v, ms, ms]
+            continue
+        if h > agg[1]:
+            agg[1] = h
+        if l < agg[2]:
+            agg[2] = l
+        agg[4] += v
+        if ms < agg[5]:
+            agg[0] = o
+            agg[5] = ms
+        if ms >= agg[6]:
+            agg[3] = c
+            agg[6] = ms
+    return [
+        (ms_to_iso(bucket * period_ms), symbol, a[0], a[1], a[2], a[3], a[4], bucket * period_ms)
+        for (symbol, bucket), a in aggs.items()
+    ]
+
+# symbol -> newest 1s bucket (epoch seconds) already flushed. Bars are
+# merged into the stored rows, so a flush only upserts the buckets its own
+# ticks touched; a tick older than this second belongs to a bar that has
+# moved on and is dropped before aggregation, keeping every timeframe in
+# agreement.
+_last_bucket = {}
+
+def _drop_late_ticks(batch):
+    fresh = []
+    newest = {}
+    for t in batch:
+        sec = t["ts"] // 1000
+        symbol = t["symbol"]
+        last = _last_bucket.get(symbol)
+        if last is not None and sec < last:
+            continue
+        fresh.append(t)
+        if sec > newest.get(symbol, -1):
+            newest[symbol] = sec
+    _last_bucket.update(newest)
+    return fresh
+
+def _aggregate_bars(batch):
+    batch = _drop_late_ticks(batch)
+    if not batch:
+        return {}
+    if len(batch) <= _SMALL_BATCH:
+        rows = _bars_python(batch)
+    else:
+        rows = _bars_numpy(batch)
+    # Only the 1s pass touches ticks; each coarser timeframe is rolled up
+    # from the (far fewer) bars of the previous one
+    rows_by_table = {BAR_TABLES["1s"]: rows}
+    for tf, period in BAR_PERIODS.items():
+        if period > 1:
+            rows = _rollup(rows, period * 1000)
+            rows_by_table[BAR_TABLES[tf]] = rows
+    return rows_by_table
 
 def start_stream(symbol):
-    if symbol in _stream_threads:
-        return
-    create_tables()
-    _ensure_flush_thread()
-    stop_event = threading.Event()
-    thread = threading.Thread(target=_start_socket, args=(symbol, stop_event), daemon=True)
-    _stream_threads[symbol] = thread
-    _stop_flags[symbol] = stop_event
-    thread.start()
+    global _socket_thread, _socket_stop
+    with _stream_lock:
+        with _symbols_lock:
+            if symbol in _symbols:
+                return
+            _symbols.add(symbol)
+        create_tables()
+        _ensure_flush_thread()
+        if _socket_thread and _socket_thread.is_alive() and not _socket_stop.is_set():
+            _send_subscription("SUBSCRIBE", [symbol])
+            return
+        # A fresh event per socket thread, so a thread still shutting down
+        # after stop_stream can't be revived
+        _socket_stop = threading.Event()
+        _socket_thread = threading.Thread(
+            target=_start_combined_socket, args=(_socket_stop,), daemon=True
+        )
+        _socket_thread.start()
 
 def stop_stream(symbol):
-    if symbol not in _stream_threads:
-        return
-    _stop_flags[symbol].set()
-    _stream_threads.pop(symbol, None)
-    _stop_flags.pop(symbol, None)
+    with _stream_lock:
+        with _symbols_lock:
+            if symbol not in _symbols:
+                return
+            _symbols.discard(symbol)
+            remaining = bool(_symbols)
+        if remaining:
+            _send_subscription("UNSUBSCRIBE", [symbol])
+            return
+        _socket_stop.set()
+        ws = _ws
+        if ws is not None:
+            ws.close()
 
 def get_status():
+    with _symbols_lock:
+        active = sorted(_symbols)
     return {
-        "active_symbols": list(_stream_threads.keys()),
-        "queue_size": _tick_queue.qsize(),
+        "active_symbols": active,
+        "queue_size": len(_tick_queue),
         "flush_alive": _flush_thread.is_alive() if _flush_thread else False,
     }